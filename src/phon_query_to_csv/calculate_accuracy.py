@@ -2,11 +2,33 @@
 
 import logging
 import os
-import pandas as pd
+from collections import defaultdict
+
+import numpy as np
 from phon_query_to_csv.logging_config import setup_logging
+from phon_query_to_csv.read_text_csv import read_text_csv
 
 log = setup_logging(logging.INFO, __name__)
 
+# Columns are read as text, except the metadata columns gen_csv fills with a
+# single value per uniform file: these repeat on every row, so they are read
+# as categoricals
+_COLUMN_DTYPES = defaultdict(
+    lambda: str,
+    {
+        column: "category"
+        for column in (
+            "Query Source",
+            "Analysis",
+            "Phase",
+            "Language",
+            "Participant",
+            "Speaker",
+            "Probe Type",
+        )
+    },
+)
+
 # Step 3: Create accuracy columns in dataframe
 def calculate_accuracy(filepath):
     """
@@ -21,27 +43,20 @@ def calculate_accuracy(filepath):
     
     output_filename = "data_accuracy.csv"
     # Read the CSV file into a DataFrame
-    df = pd.read_csv(filepath, encoding="utf-8")
-
-    # Create masks to derive accurate, substituted, and deleted phones
-    accurate_mask = df["IPA Target"] == df["IPA Actual"]
-    inaccurate_mask = df["IPA Target"] != df["IPA Actual"]
-    deletion_mask = (
-        df["IPA Actual"].isin([pd.NaT, "", " ", "∅"]) | df["IPA Actual"].isnull()
-    )
-    substitution_mask = (df["IPA Target"] != df["IPA Actual"]) & (~deletion_mask)
-
-    # Initialize columns with default values
-    df["Accuracy"] = 0
-    df["Deletion"] = 0
-    df["Substitution"] = 0
+    df = read_text_csv(filepath, dtype=_COLUMN_DTYPES)
 
     print("Processing Accuracy, Deletion, Substitution...")
 
-    # Assign values to columns based on masks
-    df.loc[accurate_mask, "Accuracy"] = 1
-    df.loc[deletion_mask, "Deletion"] = 1
-    df.loc[substitution_mask, "Substitution"] = 1
+    # Derive accurate, deleted and substituted phones from one comparison of
+    # the IPA columns, as int8 flags
+    # An empty target is never accurate, as when empty cells were read as NaN
+    accurate = (
+        (df["IPA Target"] == df["IPA Actual"]) & (df["IPA Target"] != "")
+    ).to_numpy()
+    deleted = df["IPA Actual"].isin(["", " ", "∅"]).to_numpy()
+    df["Accuracy"] = accurate.astype(np.int8)
+    df["Deletion"] = deleted.astype(np.int8)
+    df["Substitution"] = (~accurate & ~deleted).astype(np.int8)
 
     # Save the updated DataFrame to a new CSV file
     print(f"Generating {output_filename}...")
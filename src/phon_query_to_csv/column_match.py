@@ -1,17 +1,48 @@
 
 import csv
+import functools
+import itertools
 import logging
 import os
+import numpy as np
 import pandas as pd
 from phon_query_to_csv.logging_config import setup_logging
+from phon_query_to_csv.read_text_csv import read_text_csv
 
 log = setup_logging(logging.INFO, __name__)
+
+
+def _load_column_key(path):
+    """
+    Reads the target and actual column names from a column key. Cached, so
+    the key is parsed once per process however often column_match runs,
+    and again only after the file is edited.
+
+    Returns:
+        tuple: (target_cols, actual_cols) as tuples of str
+    """
+    return _read_column_key(path, os.stat(path).st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=None)
+def _read_column_key(path, mtime_ns):
+    """Parses a column key; mtime_ns is only part of the cache key."""
+    # newline="" lets the csv module handle line endings itself
+    with open(path, mode="r", newline="") as key_file:
+        key_reader = csv.reader(key_file)
+        # Extract column information from rows 2 and 3 only
+        target_cols, actual_cols = itertools.islice(key_reader, 2, 4)
+    return tuple(target_cols), tuple(actual_cols)
+
+
 # Step 3 (optional): Organizes and renames columns according to column_alignment.csv
 def column_match(
     table_to_modify,
     column_key="column_alignment.csv",
     table_to_match=None,
     output_filename="compatible_data",
+    chunksize=None,
+    output_dir=None,
 ):
     """
     Rearranges and renames columns in a DataFrame or CSV table to fit column
@@ -22,94 +53,124 @@ def column_match(
         column_key : file path. Default = 'column_alignment.csv'
         table_to_match : file path (optional). Default = None.
         output_filename : str. Default = "compatible_data"
+        chunksize : int number of rows per chunk (optional). Default = None.
+            If set and table_to_modify is a file path, the table is converted
+            and written chunk by chunk without loading it whole; new_table is
+            then returned as None.
+        output_dir : directory path for the output file (optional).
+            Default = None saves next to table_to_modify when it is a file
+            path, else in the current working directory.
 
     Generates output_filename csv file
 
     Returns:
         tuple: (new_table, actual_cols_omitted_renamed, actual_cols_added)
     """
+    source_path = None
+    table_directory = None
 
     # Import table_to_modify as DataFrame
     try:
         if os.path.isfile(table_to_modify):
             table_directory = os.path.dirname(table_to_modify)
-            print("'table_to_modify' input is a filepath.")
-            table_to_modify = pd.read_csv(table_to_modify, encoding="utf-8")
+            log.debug("'table_to_modify' input is a filepath.")
+            if chunksize:
+                # Header only; rows are streamed when the output is written
+                source_path = table_to_modify
+                table_to_modify = pd.read_csv(
+                    source_path, encoding="utf-8", nrows=0
+                )
+            else:
+                table_to_modify = read_text_csv(table_to_modify)
     except:
         pass
     else:
-        table_directory = None
         if isinstance(table_to_modify, pd.DataFrame):
-            print("'table_to_modify' input is a DataFrame already.")
+            log.debug("'table_to_modify' input is a DataFrame already.")
             warning = (
                 "table_to_modify must be valid file path, buffer object, or DataFrame"
             )
         assert type(table_to_modify) == pd.core.frame.DataFrame, warning
     new_table = table_to_modify
     # os.path.join(table_directory,
-    with open(column_key, mode="r") as key_file:
-        key_reader = csv.reader(key_file)
-        # Extract column information
-        for i, row in enumerate(key_reader):
-            if i == 2:
-                target_cols = row
-            if i == 3:
-                actual_cols = row
-
-        # Check actual columns
-        actual_cols_omitted_renamed = []
-        actual_cols_added = []
-        for col in list(table_to_modify.columns):
-            if col not in actual_cols:
-                actual_cols_omitted_renamed.append(col)
-        for col in actual_cols:
-            if col not in list(table_to_modify.columns):
-                actual_cols_added.append(col)
-        # Rename actual columns
-        for col_name_pair in zip(target_cols, actual_cols):
-            if col_name_pair[1] == "":
-                continue
-            elif col_name_pair[0] != col_name_pair[1]:
-                new_table = new_table.rename(
-                    columns={col_name_pair[1]: col_name_pair[0]}
-                )
+    target_cols, actual_cols = _load_column_key(os.path.abspath(column_key))
+    target_cols = list(target_cols)
+    actual_cols = list(actual_cols)
+    target_index = pd.Index(target_cols)
+
+    # Check actual columns
+    actual_set = set(actual_cols)
+    table_set = set(table_to_modify.columns)
+    actual_cols_omitted_renamed = [
+        col for col in table_to_modify.columns if col not in actual_set
+    ]
+    actual_cols_added = [col for col in actual_cols if col not in table_set]
+    # Rename actual columns with a single rename call
+    rename_map = {}
+    for target_col, actual_col in zip(target_cols, actual_cols):
+        if actual_col != "" and actual_col != target_col:
+            # First pairing wins, as with the former per-pair renames
+            rename_map.setdefault(actual_col, target_col)
+    new_table = new_table.rename(columns=rename_map)
+    # Reorder only when needed; reindex always copies every column
+    reorder = not new_table.columns.equals(target_index)
+    if reorder:
         new_table = new_table.reindex(columns=target_cols)
 
-        # Potential enhancement: Use optional table_to_match to import XLSX and test for compatibility.
+    # Potential enhancement: Use optional table_to_match to import XLSX and test for compatibility.
 
-        # Check new table
-        valid_transformation = True
-        if list(new_table.columns) == target_cols:
-            pass
-        elif len(list(new_table.columns)) < target_cols:
-            print("WARNING: Target column(s) unaccounted for")
+    # Check new table
+    valid_transformation = True
+    new_cols = new_table.columns
+    if not new_cols.equals(target_index):
+        if len(new_cols) < len(target_cols):
+            log.warning("WARNING: Target column(s) unaccounted for")
             valid_transformation = False
-        for i, col_name_pair in enumerate(zip(list(new_table.columns), target_cols)):
-            if col_name_pair[0] != col_name_pair[1]:
-                if i < len(target_cols):
-                    print("WARNING: Column mismatch")
-                    valid_transformation = False
-                else:
-                    print(f"Column {col_name_pair[1]} appended.")
-        if valid_transformation == True:
-            print("*****************************")
-            print("Valid transformation achieved.")
-        else:
-            print("*****************************")
-            print(
-                "WARNING: Valid transformation NOT achieved. Check file when complete."
+        # Compare the overlapping positions in one vectorized step
+        n = min(len(new_cols), len(target_index))
+        mismatches = np.flatnonzero(
+            new_cols[:n].to_numpy() != target_index[:n].to_numpy()
+        )
+        for i in mismatches:
+            log.warning(
+                "WARNING: Column mismatch at %d: %s vs %s",
+                i,
+                new_cols[i],
+                target_cols[i],
             )
-        print("Creating file...")
-
-        output_filepath = os.path.join(
-            directory, "Compiled", "merged_files", f"{output_filename}.csv"
+        if len(mismatches):
+            valid_transformation = False
+    if valid_transformation == True:
+        log.info("*****************************")
+        log.info("Valid transformation achieved.")
+    else:
+        log.warning("*****************************")
+        log.warning(
+            "WARNING: Valid transformation NOT achieved. Check file when complete."
         )
+    log.debug("Creating file...")
+
+    if output_dir is None:
+        output_dir = table_directory or os.getcwd()
+    output_filepath = os.path.join(output_dir, f"{output_filename}.csv")
+    if source_path is None:
         new_table.to_csv(
             output_filepath,
             encoding="utf-8",
             index=False,
         )
-        print("CSV file Generated:", os.path.abspath(output_filepath))
-        print("Process complete.")
-        return (new_table, actual_cols_omitted_renamed, actual_cols_added)
+    else:
+        # Renaming and reordering are per-row, so each chunk is converted
+        # on its own. Values are passed through as text.
+        with open(output_filepath, "w", encoding="utf-8", newline="") as outfile:
+            chunks = read_text_csv(source_path, chunksize=chunksize)
+            for i, chunk in enumerate(chunks):
+                chunk = chunk.rename(columns=rename_map)
+                if reorder:
+                    chunk = chunk.reindex(columns=target_cols)
+                chunk.to_csv(outfile, header=i == 0, index=False)
+        new_table = None
+    log.info("CSV file Generated: %s", os.path.abspath(output_filepath))
+    log.info("Process complete.")
+    return (new_table, actual_cols_omitted_renamed, actual_cols_added)
 
@@ -17,15 +17,15 @@ def change_dir(newdir):
     finally:
         os.chdir(prevdir)
 
-with change_dir("D:\Data\Spanish Tx Singletons"):
-    for file in os.listdir("D:\Data\Spanish Tx Singletons"):
-        if "EFE_A" in file:
-            new_file = file.replace("EFE_A", "EFE-A")
-            os.rename(file, new_file)
-        if "EFE_B" in file:
-            new_file = file.replace("EFE_B", "EFE-B")
-            os.rename(file, new_file)
-        if "(JZ Blind is for Mid probe)" in file:
-            new_file = file.replace("(JZ Blind is for Mid probe)", "")
-            os.rename(file, new_file)
-    
\ No newline at end of file
+if __name__ == "__main__":
+    with change_dir("D:\Data\Spanish Tx Singletons"):
+        for file in os.listdir("D:\Data\Spanish Tx Singletons"):
+            if "EFE_A" in file:
+                new_file = file.replace("EFE_A", "EFE-A")
+                os.rename(file, new_file)
+            if "EFE_B" in file:
+                new_file = file.replace("EFE_B", "EFE-B")
+                os.rename(file, new_file)
+            if "(JZ Blind is for Mid probe)" in file:
+                new_file = file.replace("(JZ Blind is for Mid probe)", "")
+                os.rename(file, new_file)
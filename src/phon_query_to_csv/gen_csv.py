@@ -1,19 +1,212 @@
 
 import io
 import logging
+import multiprocessing
 import os
 import re
 import shutil
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
 import pandas as pd
 from phon_query_to_csv.logging_config import setup_logging
-from phon_query_to_csv.context_manager import enter_dir, change_dir
+from phon_query_to_csv.read_text_csv import read_text_csv
 
 
 log = setup_logging(logging.INFO, __name__)
 
+# Output buffer size for uniform files (1 MiB)
+_WRITE_BUFSIZE = 1 << 20
+# Output files from later pipeline steps, never treated as query output
+_SKIP_NAMES = frozenset(
+    {
+        "full_annotated_dataset.csv",
+        "data_accuracy.csv",
+        "AllPart_AllLang_AllAnalyses_data.csv",
+    }
+)
+_ANALYSIS_RE = re.compile(
+    r"Consonants|Onset Clusters|Coda Clusters|Final Singletons|Initial Singletons|Medial Singletons|Singletons|Vowels|Initial Clusters|Final Clusters|Onset and Adjunct|Nucleus|Coda and Appendix"
+)
+# Word alignment list in a Phon 'Result' string, e.g. " a↔a,b↔b,"
+_ALIGNMENT_WORDS_PATTERN = r"( (?:\S+↔\S+,)+)"
+# More complex language identification based on dictionary
+_LANG_DICT = {
+    "PEEP": "English",
+    "Peep": "English",
+    "peep": "English",
+    "En": "English",
+    "eng": "English",
+    "EFE": "Spanish",
+    "Efe": "Spanish",
+    "efe": "Spanish",
+    "Sp": "Spanish",
+    "spa": "Spanish",
+    "else": "Unspecified",  # When Tx is in Spanish, otherwise set to Tx language
+}
+
+
+def _walk_entries(root):
+    """
+    Walks a directory tree top-down like os.walk, but yields the cached
+    os.DirEntry objects of each directory instead of lists of names.
+    Unreadable subdirectories are skipped with a warning, as os.walk skips
+    them; an unreadable root raises.
+
+    Yields:
+        tuple: (dirpath, entries)
+    """
+    # Explicit stack instead of recursion: no nested generators per level
+    stack = [root]
+    while stack:
+        dirpath = stack.pop()
+        try:
+            with os.scandir(dirpath) as it:
+                entries = list(it)
+        except OSError:
+            if dirpath == root:
+                raise
+            log.warning("Could not read directory %s, skipped", dirpath)
+            continue
+        yield dirpath, entries
+        # Push in reverse so subdirectories are visited in scandir order
+        stack.extend(
+            entry.path
+            for entry in reversed(entries)
+            if entry.is_dir(follow_symlinks=False)
+        )
+
+
+def _findall_value(match):
+    """Returns the value re.findall() would give for a match object."""
+    groups = match.re.groups
+    if groups == 0:
+        return match.group(0)
+    if groups == 1:
+        return match.group(1) or ""
+    return match.groups("")
+
+
+def _file_metadata(cur_csv, analysis, phase_pattern, participant_pattern):
+    """
+    Extracts participant, phase, language and probe values from a Phon query
+    output filename.
+
+    Returns:
+        tuple: (participant, phase, language, analysis, probe, probe_type)
+    """
+    # finditer stops scanning at the first non-empty match; "unknown" if none
+    phase = next(
+        (
+            value
+            for value in map(_findall_value, phase_pattern.finditer(cur_csv))
+            if value
+        ),
+        "unknown",
+    )
+    language = "Unspecified"  # Default language
+    for key, value in _LANG_DICT.items():
+        if key in cur_csv:
+            language = value
+            break
+    # language = cur_csv.split(".")[0] # Look in filename for language
+    match = participant_pattern.search(cur_csv)
+    if match is None:
+        raise IndexError("No participant found in filename. Is flavor set correctly?")
+    # First match only; same value as findall()[0]
+    participant = _findall_value(match)
+    probe = cur_csv.split("_")[1]
+    probe_type = phase
+    return participant, phase, language, analysis, probe, probe_type
+
+
+def _process_group(metadata, paths, uniform_dir, query):
+    """
+    Converts Phon query output files sharing the same metadata to the uniform
+    column structure and saves them as a single file in uniform_dir. Runs in a
+    gen_csv worker process.
+
+    Args:
+        metadata : tuple returned by _file_metadata() for every file in paths
+        paths : list of csv file paths
+    """
+    participant, phase, language, analysis, probe, probe_type = metadata
+    frames = []
+    for path in paths:
+        # create pandas DataFrame df from csv file
+        df = read_text_csv(path)
+        df.rename(columns={"Record #": "Record", "Group #": "Group"}, inplace=True)
+        df["filename"] = os.path.basename(path)
+        frames.append(df)
+    df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+    ###################################################
+    #### Extract keyword and column values
+    # One assign instead of six separate column insertions
+    df = df.assign(
+        **{
+            "Query Source": query,
+            "Analysis": analysis,
+            "Phase": phase,
+            "Language": language,
+            "Participant": participant,
+            # Add column of Speaker ID extracted from filename
+            "Speaker": participant,
+        }
+    )
+    ###################################################
+    # Skip building the column list when it would not be logged
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("Columns: %s", df.columns.tolist())
+    df["Probe"] = probe
+    df["Probe Type"] = probe_type
+
+    # Derive new columns from the 'Result' series with vectorized string
+    # methods, splitting on each delimiter once for all columns that need it
+    result = df["Result"]
+    alignment_tiers = result.str.split(";", n=1)
+    alignment = alignment_tiers.str[0]
+    tiers = alignment_tiers.str[1]
+    tier_fields = tiers.str.split(",")
+    # "IPA Target" and "IPA Actual" are not derived; Phon outputs those columns
+    df = df.assign(
+        **{
+            "IPA Alignment": alignment.str.strip(),
+            "Tiers": tiers.str.strip(),
+            "Notes": tiers.str.rsplit("↔", n=1).str[-1].str[3:],
+            "Orthography": tier_fields.str[0].str.strip(),
+            "IPA Target Words": tier_fields.str[1].str.strip(),
+            "IPA Actual Words": tier_fields.str[2].str.strip(),
+            # Empty when there is no alignment (when transcription empty)
+            "IPA Alignment Words": result.str.extract(
+                _ALIGNMENT_WORDS_PATTERN, expand=False
+            )
+            .str.strip()
+            .str[:-1]
+            .fillna(""),
+        }
+    )
+
+    df["IPA Target"] = df["IPA Target"].str.replace("g", "ɡ", regex=False)
+    df["IPA Actual"] = df["IPA Actual"].str.replace("g", "ɡ", regex=False)
+
+    # Save REV_csv, UTF-8
+    try:
+        out_path = os.path.join(
+            uniform_dir,
+            f"{participant}_{language}_{phase}_{analysis}_{probe}_{probe_type}.csv",
+        )
+        with io.open(out_path, "wb", buffering=_WRITE_BUFSIZE) as outfile:
+            df.to_csv(outfile, encoding="utf-8", index=False)
+    except FileNotFoundError:
+        log.error(sys.exc_info()[1])
+        log.error("Compiled Data folder not yet created")
+
+
 # Step 1: Transforms to uniform structure csv files
-def gen_csv(directory, query, phase_re, participant_re, overwrite=False):
+def gen_csv(
+    directory, query, phase_re, participant_re, overwrite=False, max_workers=None
+):
     """
     Formats a directory or subdirectories containing csv Phon query output files
     with unified column structure for input into merge_csv to generate a single
@@ -22,6 +215,8 @@ def gen_csv(directory, query, phase_re, participant_re, overwrite=False):
     Args:
         directory : directory path for original Phon query output files
         query : string specifying Phon query name
+        max_workers : int worker processes. Default=None: all CPUs on Linux, else 1.
+            Values > 1 on Windows/macOS need an if __name__ == "__main__" guard
 
     Note: participant, phase, language, analysis variables must be modified to
         specify or extract values from the current data structure. These values
@@ -29,27 +224,34 @@ def gen_csv(directory, query, phase_re, participant_re, overwrite=False):
         name str (see lines 143-167).
 
     Generates a new csv file in "Compiled/uniform_files" directory for each
-        processed output file.
+        processed output file. Output files that would share a name (same
+        participant, language, phase, analysis and probe) are combined into
+        one file instead of overwriting each other.
 
     Returns:
-        tuple: (participant_list, phase_list, language_list, analysis_list, file_count)
+        tuple: (directory, participant_set, phase_set, language_set, analysis_set,
+            probe_set, probe_type_set, file_count)
     """
 
-    participant_list = []
-    phase_list = []
-    language_list = []
-    analysis_list = []
-    probe_list = []
-    probe_type_list = []
+    participant_set = set()
+    phase_set = set()
+    language_set = set()
+    analysis_set = set()
+    probe_set = set()
+    probe_type_set = set()
     file_count = 0
+    # Files sharing an output name are converted together; see _process_group
+    groups = {}
     
     # If directory is None, request input for directory path
     while directory is None or not os.path.isdir(directory):
         directory = input("Please enter a valid directory path: ")
+    # Workers must not depend on the current working directory
+    directory = os.path.abspath(directory)
     if not overwrite: 
         try:
-            assert "Compiled" not in os.listdir(
-                directory
+            assert not os.path.isdir(
+                os.path.join(directory, "Compiled")
             ), "Compiled directory already exists. Must be moved or remove before executing script."
         except AssertionError as e:
             print(e)
@@ -64,196 +266,94 @@ def gen_csv(directory, query, phase_re, participant_re, overwrite=False):
     else:
         shutil.rmtree(os.path.join(directory, "Compiled"))
         print("Existing 'Compiled' directory has been deleted.")    
-    with change_dir(os.path.normpath(directory)):
-        for dirName, subdirList, fileList in os.walk(os.getcwd()):
-            # Skip 'Compiled' or '.bak' directories if already present"
-            if any(x in dirName for x in ["Compiled", ".bak"]):
+    phase_pattern = re.compile(phase_re)
+    participant_pattern = re.compile(participant_re)
+    uniform_dir = os.path.join(directory, "Compiled", "uniform_files")
+    os.makedirs(uniform_dir, exist_ok=True)
+    for dirName, entries in _walk_entries(directory):
+        # Skip 'Compiled' or '.bak' directories if already present"
+        if any(x in dirName for x in ["Compiled", ".bak"]):
+            continue
+        # Classify directory contents in a single pass
+        has_xls = has_xlsx = has_csv = False
+        csv_entries = []
+        for entry in entries:
+            # Symlinked files count; only directory recursion skips symlinks
+            if not entry.is_file():
                 continue
-            ## Check for Excel files in directory
-            if any(fname.endswith(".xls") for fname in os.listdir(dirName)):
-                log.warning("**Excel files located in this directory:")
-                log.warning(dirName)
-                log.critical(dirName)
-            if any(fname.endswith(".xlsx") for fname in os.listdir(dirName)):
-                log.warning("**Excel files located in this directory:")
-                log.warning(dirName)
-                log.critical(dirName)
-            ## Check for CSV files in directory
-            if not any(fname.endswith(".csv") for fname in os.listdir(dirName)):
-                log.warning("**No .csv files located in this directory:")
-                log.warning(dirName)
-            log.info("extracting from %s" % dirName)
-            try:
-                os.makedirs(os.path.join(directory, "Compiled", "uniform_files"))
-            except:  # Removed "WindowsError" for MacOS compatibility
-                log.warning(sys.exc_info()[1])
-                log.warning("Compiled Data directory already created.")
-            for cur_csv in os.listdir(dirName):
-                # Skip other files (listed below) if they occurr
-                if cur_csv in ["full_annotated_dataset.csv", 
-                               "data_accuracy.csv", 
-                               "AllPart_AllLang_AllAnalyses_data.csv"]:
-                    print(cur_csv, " skipped")
-                    continue
-                if "Summary" in cur_csv:
-                    print(cur_csv, " skipped")
-                    continue
-                # Include only CSV files
-                if cur_csv.endswith(".csv"):
-                    file_count += 1
-                    with io.open(
-                        os.path.join(dirName, cur_csv), mode="r", encoding="utf-8"
-                    ) as current_csv:
-                        # create pandas DataFrame df from csv file
-                        df = pd.read_csv(current_csv, encoding="utf-8")
-                        ###################################################
-                        #### Extract keyword and column values
-                        df.rename(columns={"Record #": "Record"}, inplace=True)
-                        df.rename(columns={"Group #": "Group"}, inplace=True)
-                        df["filename"] = cur_csv
-                        df["Query Source"] = query
-                        analysis = re.findall(
-                            r"Consonants|Onset Clusters|Coda Clusters|Final Singletons|Initial Singletons|Medial Singletons|Singletons|Vowels|Initial Clusters|Final Clusters|Onset and Adjunct|Nucleus|Coda and Appendix",
-                            dirName,
-                        )[0].replace(r"/", "")
-                        analysis_list.append(analysis)
-                        df["Analysis"] = analysis
-                        phase = "unknown"  # Default if no phase identified
-                        phase = next(
-                            (
-                                match
-                                for match in re.findall(
-                                    phase_re,
-                                    cur_csv,
-                                )
-                                if match
-                            ),
-                            "unknown",
-                        )
-                        phase_list.append(phase)
-                        df["Phase"] = phase
-                        # More complex language identification based on dictionary
-                        lang_dict = {
-                            "PEEP": "English",
-                            "Peep": "English",
-                            "peep": "English",
-                            "En": "English",
-                            "eng": "English",
-                            "EFE": "Spanish",
-                            "Efe": "Spanish",
-                            "efe": "Spanish",
-                            "Sp": "Spanish",
-                            "spa": "Spanish",
-                            "else": "Unspecified",  # When Tx is in Spanish, otherwise set to Tx language
-                        }
-                        language = "Unspecified"  # Default language
-                        for key, value in lang_dict.items():
-                            if key in cur_csv:
-                                language = value
-                                break
-                        # language = cur_csv.split(".")[0] # Look in filename for language
-                        language_list.append(language)
-                        df["Language"] = language
-                        try:
-                            participant = re.findall(
-                                participant_re,
-                                cur_csv,
-                            )[0]
-                        except IndexError as exc:
-                            raise IndexError(
-                                "No participant found in filename. Is flavor set correctly?"
-                            ) from exc
-
-                        participant_list.append(participant)
-                        df["Participant"] = participant
-                        # Add column of Speaker ID extracted from filename
-                        df["Speaker"] = participant
-                        ###################################################
-                        print(
-                            "***********************************************\n",
-                            list(df),
-                        )
-                        probe = cur_csv.split("_")[1]
-                        probe_list.append(probe)
-                        df["Probe"] = probe
-                        probe_type = phase
-                        probe_type_list.append(probe_type)
-                        df["Probe Type"] = probe_type
-
-                        # Apply transformation to 'Result' series to generate new columns
-                        derive_dict = {
-                            "IPA Alignment": lambda x: x.split(";", 1)[0].strip(),
-                            # "IPA Target": lambda x: x.split(";", 1)[0] # Redundant with IPA Target column
-                            # .strip()
-                            # .split("↔")[0]
-                            # .strip(),
-                            # "IPA Actual": lambda x: x.split(";", 1)[0] # Redundant with IPA Actual column
-                            # .strip()
-                            # .split("↔")[1]
-                            # .strip(),
-                            "Tiers": lambda x: x.split(";", 1)[1].strip(),
-                            "Notes": lambda x: x.split(";", 1)[1].split("↔")[-1][3:],
-                            "Orthography": lambda x: x.split(";", 1)[1]
-                            .split(",")[0]
-                            .strip(),
-                            "IPA Target Words": lambda x: x.split(";", 1)[1]
-                            .split(",")[1]
-                            .strip(),
-                            "IPA Actual Words": lambda x: x.split(";", 1)[1]
-                            .split(",")[2]
-                            .strip(),
-                            "IPA Alignment Words": lambda x: (
-                                re.search(
-                                    r" (\S+↔\S+,)+", x
-                                )  # updated to allow for no data (when transcription empty)
-                                .group(0)
-                                .strip()[:-1]
-                                if re.search(r" (\S+↔\S+,)+", x) is not None
-                                else ""
-                            ),
-                        }
-
-                        for key in derive_dict.keys():
-                            df[key] = df["Result"].apply(derive_dict[key])
-
-                        df["IPA Target"] = df["IPA Target"].replace(
-                            {"g": "ɡ"}, regex=True
-                        )
-                        df["IPA Actual"] = df["IPA Actual"].replace(
-                            {"g": "ɡ"}, regex=True
-                        )
-
-                        # Save REV_csv, UTF-8
-                        log.info("Current working directory" + os.getcwd())
-                        try:
-                            df.to_csv(
-                                os.path.join(
-                                    directory,
-                                    "Compiled",
-                                    "uniform_files",
-                                    "%s_%s_%s_%s_%s_%s.csv"
-                                    % (
-                                        participant,
-                                        language,
-                                        phase,
-                                        analysis,
-                                        probe,
-                                        probe_type,
-                                    ),
-                                ),
-                                encoding="utf-8",
-                                index=False,
-                            )
-                        except FileNotFoundError:
-                            log.error(sys.exc_info()[1])
-                            log.error("Compiled Data folder not yet created")
-        return (
-            directory,
-            set(participant_list),
-            set(phase_list),
-            set(language_list),
-            set(analysis_list),
-            set(probe_list),
-            set(probe_type),
-            file_count,
+            extension = os.path.splitext(entry.name)[1].lower()
+            if extension == ".csv":
+                has_csv = True
+                csv_entries.append(entry)
+            elif extension == ".xlsx":
+                has_xlsx = True
+            elif extension == ".xls":
+                has_xls = True
+        ## Check for Excel files in directory
+        if has_xls:
+            log.warning("**Excel files located in this directory:")
+            log.warning(dirName)
+            log.critical(dirName)
+        if has_xlsx:
+            log.warning("**Excel files located in this directory:")
+            log.warning(dirName)
+            log.critical(dirName)
+        ## Check for CSV files in directory
+        if not has_csv:
+            log.warning("**No .csv files located in this directory:")
+            log.warning(dirName)
+        log.info("extracting from %s", dirName)
+        analysis_match = _ANALYSIS_RE.search(dirName)
+        for entry in csv_entries:
+            cur_csv = entry.name
+            # Skip other files (listed below) if they occurr
+            if cur_csv in _SKIP_NAMES or "Summary" in cur_csv:
+                log.debug("%s skipped", cur_csv)
+                continue
+            analysis = analysis_match.group(0).replace(r"/", "")
+            metadata = _file_metadata(
+                cur_csv, analysis, phase_pattern, participant_pattern
+            )
+            groups.setdefault(metadata, []).append(entry.path)
+            participant, phase, language, analysis, probe, probe_type = metadata
+            participant_set.add(participant)
+            phase_set.add(phase)
+            language_set.add(language)
+            analysis_set.add(analysis)
+            probe_set.add(probe)
+            probe_type_set.add(probe_type)
+            file_count += 1
+    # Groups are independent, so convert them in parallel worker processes
+    worker = partial(_process_group, uniform_dir=uniform_dir, query=query)
+    if max_workers is None:
+        # Spawned workers re-import the caller's script, which fails unless it
+        # is guarded by if __name__ == "__main__", so only fork is used by default
+        start_method = (
+            multiprocessing.get_start_method(allow_none=True)
+            or multiprocessing.get_all_start_methods()[0]
         )
+        max_workers = (os.cpu_count() or 1) if start_method == "fork" else 1
+    if max_workers == 1 or len(groups) < 2:
+        # Not worth starting a pool; also eases debugging
+        for metadata, paths in groups.items():
+            worker(metadata, paths)
+    else:
+        # About four chunks per worker balances IPC cost against idle workers
+        chunksize = max(1, len(groups) // (max_workers * 4))
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            # Consume the results so that worker exceptions are raised here
+            list(
+                executor.map(
+                    worker, groups.keys(), groups.values(), chunksize=chunksize
+                )
+            )
+    return (
+        directory,
+        participant_set,
+        phase_set,
+        language_set,
+        analysis_set,
+        probe_set,
+        probe_type_set,
+        file_count,
+    )
@@ -22,7 +22,8 @@ def setup_logging(loglevel,file_name, logfile='phon_query_to_csv.log'):
     ch.setFormatter(logging.Formatter('%(message)s'))
 
     # create file handler and set level to debug
-    fh = logging.FileHandler(logfile)
+    # delay=True: the log file is only created once a message is emitted
+    fh = logging.FileHandler(logfile, delay=True)
     fh.setLevel(loglevel)
     fh.setFormatter(logging.Formatter('%(message)s | %(asctime)s | %(levelname)s | %(name)s '))
 
@@ -1,15 +1,151 @@
 
-import csv
-import glob
+import errno
+import fnmatch
 import io
 import os
+import queue
 import shutil
 import sys
+import threading
 import logging
 from phon_query_to_csv.logging_config import setup_logging
 
 log = setup_logging(logging.INFO, __name__)
 
+# Block size for concatenating uniform files (1 MiB)
+_COPY_BUFSIZE = 1 << 20
+# Blocks read ahead of the writer in _concat_csv
+_READ_AHEAD = 4
+# Block size for locating headers in _sendfile_csv
+_HEADER_BLOCK = 4096
+# sendfile() between regular files is only supported on Linux
+_USE_SENDFILE = sys.platform.startswith("linux") and hasattr(os, "sendfile")
+
+
+def _header_length(fd):
+    """
+    Returns the byte length of the first line of an open file, including its
+    newline, reading only as many small blocks with os.pread as needed.
+    """
+    offset = 0
+    while True:
+        block = os.pread(fd, _HEADER_BLOCK, offset)
+        if not block:
+            return offset  # No newline: the whole file is the header
+        newline = block.find(b"\n")
+        if newline != -1:
+            return offset + newline + 1
+        offset += len(block)
+
+
+def _sendfile_csv(fnames, outfile, bufsize=_COPY_BUFSIZE):
+    """
+    Appends csv files to an open binary outfile with os.sendfile, keeping only
+    the first file's header. Apart from locating each header, file contents
+    are copied inside the kernel instead of through Python buffers.
+
+    Files on filesystems that reject sendfile (some FUSE, network and shared
+    folder mounts) are block copied instead, as shutil does.
+
+    Args:
+        fnames : iterable of csv file paths
+        outfile : binary file object opened for writing
+        bufsize : int block size in bytes for the fallback copy. Default=1 MiB
+    """
+    # Pending buffered writes must land before sendfile appends to the fd
+    outfile.flush()
+    out_fd = outfile.fileno()
+    for i, fname in enumerate(fnames):
+        with io.open(fname, "rb", buffering=0) as infile:
+            # Throw away header on all but first file
+            start = offset = _header_length(infile.fileno()) if i != 0 else 0
+            remaining = os.fstat(infile.fileno()).st_size - offset
+            while remaining > 0:
+                try:
+                    sent = os.sendfile(out_fd, infile.fileno(), offset, remaining)
+                except OSError as err:
+                    # Only a file with nothing sent yet can be copied over
+                    if err.errno == errno.ENOSPC or offset != start:
+                        raise
+                    log.debug("sendfile failed for %s: %s", fname, err)
+                    infile.seek(offset)
+                    shutil.copyfileobj(infile, outfile, bufsize)
+                    outfile.flush()
+                    break
+                if sent == 0:
+                    break  # File shrank while copying
+                offset += sent
+                remaining -= sent
+        log.info("%s has been imported.", fname)
+
+
+def _concat_csv(fnames, outfile, bufsize=_COPY_BUFSIZE, depth=_READ_AHEAD):
+    """
+    Appends csv files to an open binary outfile, keeping only the first
+    file's header.
+
+    On Linux the files are copied with os.sendfile (see _sendfile_csv).
+    Elsewhere a reader thread fills a bounded queue with blocks of up to
+    bufsize bytes while the calling thread writes them out, so reading the
+    next block overlaps writing the current one.
+
+    Args:
+        fnames : iterable of csv file paths
+        outfile : binary file object opened for writing
+        bufsize : int block size in bytes. Default=1 MiB. On Linux only used
+            for files sendfile cannot copy.
+        depth : int number of blocks the reader may run ahead. Default=4.
+            Not used on Linux.
+    """
+    if _USE_SENDFILE:
+        return _sendfile_csv(fnames, outfile, bufsize)
+    blocks = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    errors = []
+
+    def put(block):
+        # Give up if the writer has stopped, rather than blocking forever
+        while not stop.is_set():
+            try:
+                blocks.put(block, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def read_blocks():
+        try:
+            for i, fname in enumerate(fnames):
+                with io.open(fname, "rb", buffering=bufsize) as infile:
+                    if i != 0:
+                        infile.readline()  # Throw away header on all but first file
+                    # Block copy rest of file from input to output without parsing
+                    while True:
+                        block = infile.read(bufsize)
+                        if not block:
+                            break
+                        if not put(block):
+                            return
+                log.info("%s has been imported.", fname)
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            put(None)
+
+    reader = threading.Thread(target=read_blocks, daemon=True)
+    reader.start()
+    try:
+        while True:
+            block = blocks.get()
+            if block is None:
+                break
+            outfile.write(block)
+    finally:
+        stop.set()
+        reader.join()
+    if errors:
+        raise errors[0]
+
 # Step 2: Merges uniformly structured csv files
 def merge_csv(
     directory,
@@ -52,93 +188,42 @@ def merge_csv(
     if analysis_list != ["AllAnalyses"]:
         warning = "If a custom analysis_list is passed, separate_analyses must = True"
         assert separate_analyses == True, warning
-    try:
-        os.makedirs(os.path.join(directory, "Compiled", "merged_files"))
-    # Was WindowsError for Windows operating system.
-    except FileExistsError as e:
-        log.warning(str(e))
-        log.warning(sys.exc_info()[1])
-        log.warning("Compiled Data directory already created.")
+    uniform_dir = os.path.join(directory, "Compiled", "uniform_files")
+    merged_dir = os.path.join(directory, "Compiled", "merged_files")
+    os.makedirs(merged_dir, exist_ok=True)
+    # List the uniform files once rather than globbing for every combination.
+    # Hidden files (e.g. macOS "._" AppleDouble files) are skipped, as by glob
+    with os.scandir(uniform_dir) as it:
+        uniform_entries = [
+            entry
+            for entry in it
+            if entry.name.endswith(".csv") and not entry.name.startswith(".")
+        ]
     for participant in participant_list:
         for language in language_list:
             for analysis in analysis_list:
                 save_path = os.path.join(
-                    directory,
-                    "Compiled",
-                    "merged_files",
-                    f"{participant}_{language}_{analysis}_data.csv",
+                    merged_dir, f"{participant}_{language}_{analysis}_data.csv"
                 )
-                with io.open(save_path, "wb") as outfile:
+                with io.open(save_path, "wb", buffering=_COPY_BUFSIZE) as outfile:
                     log.info(outfile)
-                    # participantdata = os.path.join(directory, 'Compiled Data', '%s*.csv' (participant))
+                    # Keep files whose names contain the requested components
+                    # in order, with the same pattern glob used
+                    needles = []
                     if separate_participants:
-                        if separate_languages:
-                            if separate_analyses:
-                                file_search_term = os.path.join(
-                                    directory,
-                                    "Compiled",
-                                    "uniform_files",
-                                    f"*{participant}*{language}*{analysis}*.csv",
-                                )
-                                # file_search_term = f"{directory}\\Compiled\\uniform_files\\*{participant}*{language}*{analysis}*.csv"
-                            else:
-                                file_search_term = os.path.join(
-                                    directory,
-                                    "Compiled",
-                                    "uniform_files",
-                                    f"*{participant}*{language}*.csv",
-                                )
-                        else:
-                            if separate_analyses:
-                                file_search_term = os.path.join(
-                                    directory,
-                                    "Compiled",
-                                    "uniform_files",
-                                    f"*{participant}*{analysis}*.csv",
-                                )
-                            else:
-                                file_search_term = os.path.join(
-                                    directory,
-                                    "Compiled",
-                                    "uniform_files",
-                                    f"*{participant}*.csv",
-                                )
-                    else:
-                        if separate_languages:
-                            if separate_analyses:
-                                file_search_term = os.path.join(
-                                    directory,
-                                    "Compiled",
-                                    "uniform_files",
-                                    f"*{language}*{analysis}*.csv",
-                                )
-                            else:
-                                file_search_term = os.path.join(
-                                    directory,
-                                    "Compiled",
-                                    "uniform_files",
-                                    f"*{language}*.csv",
-                                )
-                        else:
-                            if separate_analyses:
-                                file_search_term = os.path.join(
-                                    directory,
-                                    "Compiled",
-                                    "uniform_files",
-                                    f"*{analysis}*.csv",
-                                )
-                            else:
-                                file_search_term = os.path.join(
-                                    directory, "Compiled", "uniform_files", "*.csv"
-                                )
-                    for i, fname in enumerate(glob.glob(file_search_term)):
-                        with io.open(fname, "rb") as infile:
-                            if i != 0:
-                                infile.readline()  # Throw away header on all but first file
-                            # Block copy rest of file from input to output without parsing
-                            shutil.copyfileobj(infile, outfile)
-                            log.info(fname + " has been imported.")
-                    csv.writer(outfile)
-                    log.info("Saved", outfile)
+                        needles.append(participant)
+                    if separate_languages:
+                        needles.append(language)
+                    if separate_analyses:
+                        needles.append(analysis)
+                    pattern = "*" + "*".join(needles) + "*.csv"
+                    # Lazily yield matches while copying, like glob.iglob
+                    matches = (
+                        entry.path
+                        for entry in uniform_entries
+                        if fnmatch.fnmatch(entry.name, pattern)
+                    )
+                    _concat_csv(matches, outfile)
+                    log.info("Saved %s", save_path)
 
     return save_path
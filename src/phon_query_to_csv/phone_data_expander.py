@@ -18,6 +18,7 @@ from ipa_features import ipa_map
 # from tqdm import tqdm # For progress bar
 
 from phon_query_to_csv.logging_config import setup_logging
+from phon_query_to_csv.read_text_csv import read_text_csv
 
 log = setup_logging(logging.INFO, __name__)
 
@@ -29,7 +30,7 @@ def phone_data_expander(file_location, directory, target=True, actual=True):
 
     if not isinstance(file_location, pd.DataFrame):
         # If not, assume it's a file location and load the data
-        df = pd.read_csv(file_location)
+        df = read_text_csv(file_location)
     else:
         df = file_location
     
@@ -71,8 +72,42 @@ def phone_data_expander(file_location, directory, target=True, actual=True):
         seg_cols = [seg_counter] + seg_cols
         return seg_cols
 
+    def expand_segments(ipa_series):
+        """
+        Applies get_cols_each_segment() to a Series of IPA strings.
+
+        Transcriptions repeat heavily, so each distinct string is expanded only
+        once and the resulting rows are mapped back onto the Series index. The
+        segment and feature columns hold few distinct values and are returned
+        as categoricals; the leading segment count stays numeric.
+
+        Returns:
+            DataFrame: seg_cols_list columns aligned with ipa_series.
+        """
+        codes, uniques = pd.factorize(ipa_series, use_na_sentinel=False)
+        unique_rows = pd.DataFrame(
+            [get_cols_each_segment(cell_string) for cell_string in uniques],
+            columns=seg_cols_list,
+        ).fillna("")
+        unique_rows = unique_rows.astype(
+            {col: "category" for col in seg_cols_list[1:]}
+        )
+        return unique_rows.iloc[codes].set_axis(ipa_series.index)
+
+    # Frames of new columns, joined to df in a single concat at the end
+    new_cols = []
+
     if actual is True:
-        df["ID-Actual-Lang"] = df["Participant"].astype(str) + df["IPA Actual"] + df["Language"]
+        new_cols.append(
+            pd.DataFrame(
+                {
+                    "ID-Actual-Lang": df["Participant"].astype(str)
+                    + df["IPA Actual"]
+                    + df["Language"]
+                },
+                index=df.index,
+            )
+        )
         actual_seg_cols = ["A1", "A2", "A3"]
         feature_cols = OrderedDict()
         for col in actual_seg_cols:
@@ -88,23 +123,33 @@ def phone_data_expander(file_location, directory, target=True, actual=True):
             seg_cols_list.extend(feature_cols[key])
         
         try:
-            df[seg_cols_list] = df['IPA Actual'].apply(get_cols_each_segment).apply(pd.Series)
+            new_cols.append(expand_segments(df['IPA Actual']))
         except IndexError as exc:
             raise ValueError("Processing 'IPA Actual' features columns error.") from exc
-        df[seg_cols_list] = df[seg_cols_list].fillna("")
 
 
     if target is True:   
-        df["ID-Target-Lang"] = df["Participant"] + df["IPA Target"] + df["Language"]
         target_seg_cols = ["T1", "T2", "T3"]
         feature_cols = OrderedDict()
         for col in target_seg_cols:
             feature_cols.update({col: [f"{col}_{prop}" for prop in properties_seg]})
             
-        df["Target Type"] = np.where(
-            df["IPA Target"].str.len() == 1,
-            "C",
-            np.where(df["IPA Target"].str.len() == 2, "CC", "CCC"),
+        # Measure the target strings once for both comparisons
+        target_len = df["IPA Target"].str.len()
+        new_cols.append(
+            pd.DataFrame(
+                {
+                    "ID-Target-Lang": df["Participant"]
+                    + df["IPA Target"]
+                    + df["Language"],
+                    "Target Type": np.where(
+                        target_len == 1,
+                        "C",
+                        np.where(target_len == 2, "CC", "CCC"),
+                    ),
+                },
+                index=df.index,
+            )
         )
         
         seg_cols_list = []
@@ -115,13 +160,15 @@ def phone_data_expander(file_location, directory, target=True, actual=True):
             seg_cols_list.extend(feature_cols[key])
         
         try:
-            df[seg_cols_list] = df['IPA Target'].apply(get_cols_each_segment).apply(pd.Series)
+            new_cols.append(expand_segments(df['IPA Target']))
         except IndexError as exc:
             raise ValueError("Processing 'IPA Target' features columns error.") from exc
-        df[seg_cols_list] = df[seg_cols_list].fillna("")
         
         # TODO: Handle IPA Target with diacritics or more than 3 characters
-        
+
+    if new_cols:
+        df = pd.concat([df, *new_cols], axis=1)
+
     output_filepath = os.path.join(
         directory, "Compiled", "merged_files", "full_annotated_dataset.csv"
     )
@@ -0,0 +1,21 @@
+"""
+Reading pipeline csv files as text
+"""
+
+import pandas as pd
+
+
+def read_text_csv(filepath_or_buffer, **kwargs):
+    """Read a UTF-8 csv file with every value kept as text
+
+    No type inference and no NaN detection: empty cells stay "" and values
+    such as participant IDs keep their leading zeros.
+
+    Args:
+      filepath_or_buffer: file path or buffer object passed to pd.read_csv
+      **kwargs: further pd.read_csv arguments; dtype may override str
+    """
+    kwargs.setdefault("dtype", str)
+    return pd.read_csv(
+        filepath_or_buffer, encoding="utf-8", na_filter=False, **kwargs
+    )
@@ -0,0 +1,62 @@
+import os
+
+import pandas as pd
+
+import phon_query_to_csv.column_match as column_match_module
+from phon_query_to_csv.column_match import column_match
+
+COLUMN_KEY = os.path.join(
+    os.path.dirname(column_match_module.__file__), "column_alignment.csv"
+)
+
+
+def test_chunked_output_matches_full_output(tmp_path):
+    """Writing chunk by chunk gives the same file as converting the whole table"""
+    table = pd.DataFrame(
+        {
+            "Record #": ["1", "2", "3", "4", "5"],
+            "IPA Target": ["s", "", "pl", "k", "∅"],
+            "IPA Actual": ["s", "t", "", "k, g", '"a"'],
+            "Result": ["s ↔ s", "", "pl ↔ ∅", "k ↔ k", "∅ ↔ a"],
+            "Extra": ["x", "y", "z", "", "w"],
+        }
+    )
+    source = tmp_path / "table.csv"
+    table.to_csv(source, index=False)
+
+    full = column_match(str(source), column_key=COLUMN_KEY, output_filename="full")
+    chunked = column_match(
+        str(source), column_key=COLUMN_KEY, output_filename="chunked", chunksize=2
+    )
+
+    assert chunked[0] is None
+    assert chunked[1:] == full[1:]
+    # Output is saved next to the input table by default
+    assert (tmp_path / "chunked.csv").read_bytes() == (
+        tmp_path / "full.csv"
+    ).read_bytes()
+
+
+def test_output_dir(tmp_path):
+    """output_dir sets where the output file is saved"""
+    table = pd.DataFrame({"IPA Target": ["s"], "IPA Actual": ["t"]})
+    output_dir = tmp_path / "out"
+    output_dir.mkdir()
+    column_match(
+        table,
+        column_key=COLUMN_KEY,
+        output_filename="matched",
+        output_dir=str(output_dir),
+    )
+    assert (output_dir / "matched.csv").is_file()
+
+
+def test_edited_column_key_is_reread(tmp_path):
+    """The cached column key is parsed again once the file changes"""
+    key = tmp_path / "key.csv"
+    key.write_text("\n\nIPA Target\nIPA Actual\n", encoding="utf-8")
+    assert column_match_module._load_column_key(str(key))[0] == ("IPA Target",)
+    key.write_text("\n\nTarget\nIPA Target\n", encoding="utf-8")
+    # Make the edit visible on filesystems with coarse timestamps
+    os.utime(key, ns=(0, key.stat().st_mtime_ns + 10**9))
+    assert column_match_module._load_column_key(str(key))[0] == ("Target",)
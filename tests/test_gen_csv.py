@@ -0,0 +1,39 @@
+import os
+import shutil
+
+import pandas as pd
+
+from phon_query_to_csv.gen_csv import gen_csv
+
+FIXTURE = os.path.join(
+    os.path.dirname(__file__),
+    "typology_actual_test",
+    "English",
+    "Consonants Listing",
+    "Table by Session",
+    "eng.001eng_pI.csv",
+)
+
+
+def test_colliding_files_are_combined(tmp_path):
+    """Files that would share a uniform file name end up in one file"""
+    for subdir in ("a", "b"):
+        folder = tmp_path / "Consonants" / subdir
+        folder.mkdir(parents=True)
+        shutil.copy(FIXTURE, folder)
+
+    result = gen_csv(str(tmp_path), "test", r"p[IVX]+", r"\d\d\d", max_workers=1)
+    assert result[-1] == 2
+
+    uniform_dir = tmp_path / "Compiled" / "uniform_files"
+    uniform_files = os.listdir(uniform_dir)
+    assert len(uniform_files) == 1
+
+    source = pd.read_csv(FIXTURE, dtype=str, na_filter=False)
+    uniform = pd.read_csv(
+        uniform_dir / uniform_files[0], dtype=str, na_filter=False
+    )
+    assert len(uniform) == 2 * len(source)
+    # Both copies contribute every row, in walk order
+    for half in (uniform.iloc[: len(source)], uniform.iloc[len(source) :]):
+        assert half["Result"].tolist() == source["Result"].tolist()
@@ -0,0 +1,64 @@
+import errno
+import io
+import os
+
+import pytest
+
+import phon_query_to_csv.merge_csv as merge_csv_module
+
+CONTENTS = [
+    b"a,b\n1,2\n3,4\n",
+    b"a,b\n5,6\n",
+    b"a,b\n",  # Header only
+    b"a,b\n" + b"7,8\n" * 1000,
+    b"a,b\n9,10",  # No trailing newline
+]
+EXPECTED = b"a,b\n1,2\n3,4\n5,6\n" + b"7,8\n" * 1000 + b"9,10"
+
+
+def _write_inputs(tmp_path):
+    fnames = []
+    for i, content in enumerate(CONTENTS):
+        path = tmp_path / f"in{i}.csv"
+        path.write_bytes(content)
+        fnames.append(str(path))
+    return fnames
+
+
+def _concat(fnames, path, use_sendfile, monkeypatch):
+    monkeypatch.setattr(merge_csv_module, "_USE_SENDFILE", use_sendfile)
+    with io.open(path, "wb") as outfile:
+        merge_csv_module._concat_csv(fnames, outfile, bufsize=8)
+    return path.read_bytes()
+
+
+def test_threaded_copy(tmp_path, monkeypatch):
+    """The block copy keeps only the first header and every row"""
+    fnames = _write_inputs(tmp_path)
+    assert _concat(fnames, tmp_path / "out.csv", False, monkeypatch) == EXPECTED
+
+
+@pytest.mark.skipif(
+    not merge_csv_module._USE_SENDFILE, reason="sendfile copy only used on Linux"
+)
+def test_sendfile_matches_threaded_copy(tmp_path, monkeypatch):
+    """Both copy paths give the same file"""
+    fnames = _write_inputs(tmp_path)
+    threaded = _concat(fnames, tmp_path / "threaded.csv", False, monkeypatch)
+    sendfile = _concat(fnames, tmp_path / "sendfile.csv", True, monkeypatch)
+    assert sendfile == threaded
+
+
+@pytest.mark.skipif(not hasattr(os, "pread"), reason="os.pread unavailable")
+def test_sendfile_falls_back_to_block_copy(tmp_path, monkeypatch):
+    """Files sendfile rejects are block copied instead"""
+
+    def sendfile(out_fd, in_fd, offset, count):
+        raise OSError(errno.EINVAL, os.strerror(errno.EINVAL))
+
+    monkeypatch.setattr(os, "sendfile", sendfile, raising=False)
+    fnames = _write_inputs(tmp_path)
+    out_path = tmp_path / "out.csv"
+    with io.open(out_path, "wb") as outfile:
+        merge_csv_module._sendfile_csv(fnames, outfile, bufsize=8)
+    assert out_path.read_bytes() == EXPECTED